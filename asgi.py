@@ -0,0 +1,171 @@
+"""ASGI entry point: the Flask app over HTTP plus a WebSocket chat at /ws.
+
+Run with ``uvicorn asgi:application``. The user is authenticated once, from
+the Flask session cookie, when the socket connects; after that every message
+is answered on the event loop without touching Flask-Login or the database.
+"""
+import asyncio
+from http.cookies import SimpleCookie
+import json
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import chatbot, conversation_log, create_app, get_logged_response, load_user, start_chat_session
+
+# Close codes from RFC 6455 / the IANA registry.
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TOO_BIG = 1009
+CLOSE_TRY_AGAIN_LATER = 1013
+
+app = create_app()
+connections = set()
+
+
+class ThreadedWsgiToAsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs every WSGI request on one shared thread, which serialises
+    # /get and deadlocks under concurrent requests; use the thread pool.
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiToAsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+wsgi_application = ThreadedWsgiToAsgi(app)
+
+
+def session_user_id(scope):
+    """Return the logged-in user id from the scope's session cookie, or None."""
+    cookie_header = b'; '.join(value for name, value in scope['headers'] if name == b'cookie')
+    morsel = SimpleCookie(cookie_header.decode('latin-1')).get(app.config['SESSION_COOKIE_NAME'])
+    if morsel is None:
+        return None
+    serializer = app.session_interface.get_signing_serializer(app)
+    try:
+        session = serializer.loads(morsel.value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return None
+    return session.get('_user_id')
+
+
+def origin_allowed(scope):
+    """Browsers always send Origin on a WebSocket handshake; it has to be this site or an allowed one."""
+    headers = dict(scope['headers'])
+    origin = headers.get(b'origin')
+    if origin is None:
+        # Not a browser, so not a page riding on someone else's cookie.
+        return True
+    origin = origin.decode('latin-1')
+    if origin in app.config['WEBSOCKET_ALLOWED_ORIGINS']:
+        return True
+    return urlsplit(origin).netloc == headers.get(b'host', b'').decode('latin-1')
+
+
+def find_user(user_id):
+    with app.app_context():
+        return load_user(user_id)
+
+
+async def chat_socket(scope, receive, send):
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    if len(connections) >= app.config['WEBSOCKET_MAX_CONNECTIONS']:
+        await send({'type': 'websocket.close', 'code': CLOSE_TRY_AGAIN_LATER})
+        return
+    # Take the slot before the first await, so simultaneous connects cannot
+    # all pass the check above.
+    task = asyncio.current_task()
+    connections.add(task)
+    try:
+        await serve_socket(scope, receive, send)
+    finally:
+        connections.discard(task)
+
+
+async def serve_socket(scope, receive, send):
+    if not origin_allowed(scope):
+        await send({'type': 'websocket.close', 'code': CLOSE_POLICY_VIOLATION})
+        return
+    user_id = session_user_id(scope)
+    user = user_id and await sync_to_async(find_user, thread_sensitive=False)(user_id)
+    if not user:
+        await send({'type': 'websocket.close', 'code': CLOSE_POLICY_VIOLATION})
+        return
+
+    await send({'type': 'websocket.accept'})
+    # Bounded inbox: once it is full we stop reading the socket, and the
+    # client is slowed down by TCP flow control instead of growing our memory.
+    inbox = asyncio.Queue(app.config['WEBSOCKET_QUEUE_SIZE'])
+    # One logged chat session per socket.
+    session_id = start_chat_session(user.id) if conversation_log.enabled else None
+    replier = asyncio.create_task(reply(inbox, send, user.id, session_id))
+    try:
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                break
+            text, data = event.get('text'), event.get('bytes')
+            if text is not None:
+                data = text.encode('utf-8')
+            elif data is not None:
+                text = data.decode('utf-8', 'replace')
+            # The limit is in bytes; a text frame of multibyte characters is longer than its len().
+            if len(data or b'') > app.config['WEBSOCKET_MAX_MESSAGE_BYTES']:
+                await send({'type': 'websocket.close', 'code': CLOSE_TOO_BIG})
+                break
+            await inbox.put((text or '', time.perf_counter()))
+    finally:
+        replier.cancel()
+
+
+async def reply(inbox, send, user_id, session_id):
+    while True:
+        text, started = await inbox.get()
+        try:
+            payload = json.loads(text)
+            msg, msg_id = payload['msg'], payload.get('id')
+        except (ValueError, TypeError, KeyError):
+            msg, msg_id = text, None
+        if not isinstance(msg, str):
+            # {"msg": null} would otherwise be scored (and logged) as the word "None".
+            await send({'type': 'websocket.send',
+                        'text': json.dumps({'id': msg_id, 'error': 'Expected a JSON body like {"msg": "..."}'})})
+            continue
+        if session_id is None:
+            answer, args = chatbot.get_response, (msg,)
+        else:
+            answer, args = get_logged_response, (msg, user_id, session_id, started)
+        if chatbot.semantic is None:
+            # Scoring takes microseconds (and usually hits the response cache),
+            # and logging only queues a row, so both run on the loop rather
+            # than paying for a thread hop.
+            response = answer(*args)
+        else:
+            # The semantic fallback can wait up to SEMANTIC_TIMEOUT for the
+            # model; do that on a thread so other sockets keep going and
+            # their misses can share a batch.
+            response = await sync_to_async(answer, thread_sensitive=False)(*args)
+        await send({'type': 'websocket.send', 'text': json.dumps({'id': msg_id, 'response': response})})
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket' and scope['path'] == app.config['WEBSOCKET_PATH']:
+        await chat_socket(scope, receive, send)
+    elif scope['type'] == 'websocket':
+        await receive()
+        await send({'type': 'websocket.close', 'code': CLOSE_POLICY_VIOLATION})
+    elif scope['type'] == 'lifespan':
+        while True:
+            event = await receive()
+            if event['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif event['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    else:
+        await wsgi_application(scope, receive, send)
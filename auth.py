@@ -0,0 +1,156 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import threading
+import time
+
+import bcrypt
+from flask_login import UserMixin
+
+
+class HasherBusy(Exception):
+    """Raised instead of queueing when the password hashing pool is full."""
+
+
+class CachedUser(UserMixin):
+    """Detached copy of a User row; carries no password hash and no session."""
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+
+class IdentityCache:
+    """TTL-bounded user_id -> CachedUser map in front of load_user.
+
+    Entries are dropped on logout and whenever the User row changes in this
+    process; the TTL bounds how long other workers may see a stale copy.
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.users = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self.users.get(str(user_id))
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            self.invalidate(user_id)
+            return None
+        return user
+
+    def put(self, user):
+        cached = CachedUser(user.id, user.username)
+        if self.ttl:
+            with self.lock:
+                if len(self.users) >= self.max_entries:
+                    self.users.pop(next(iter(self.users)), None)
+                self.users[str(user.id)] = (cached, time.monotonic() + self.ttl)
+        return cached
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.users.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+def _hash_password(password, log_rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=log_rounds)).decode('utf-8')
+
+
+def _check_password(pw_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+    except ValueError:
+        # Not a bcrypt hash.
+        return False
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small process pool with a hard cap on queued work.
+
+    Login storms get a HasherBusy straight away once max_pending hashes are
+    in flight, instead of every web thread queueing behind the CPU.
+    """
+
+    def __init__(self):
+        self.log_rounds = 12
+        self.workers = 2
+        self.max_pending = 8
+        self.timeout = 10
+        self.pool = None
+        self.pool_pid = None
+        self.pool_lock = threading.Lock()
+        self.slots = None
+
+    def init_app(self, app):
+        self.log_rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.workers = app.config['BCRYPT_POOL_WORKERS']
+        self.max_pending = app.config['BCRYPT_POOL_MAX_PENDING']
+        self.timeout = app.config['BCRYPT_POOL_TIMEOUT']
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+
+    def _submit(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            # Created on first use in each process, so a preloading server
+            # never forks a master that already owns pool processes.
+            with self.pool_lock:
+                if self.pool is None or self.pool_pid != os.getpid():
+                    self.pool = ProcessPoolExecutor(self.workers, mp_context=self.mp_context())
+                    self.pool_pid = os.getpid()
+                pool = self.pool
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self.slots.release()
+            self._discard(pool)
+            raise HasherBusy()
+        except BaseException:
+            self.slots.release()
+            raise
+        # cancel() cannot stop a hash that is already running, so the slot is
+        # only given back once the job has really finished.
+        future.add_done_callback(self._release)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HasherBusy()
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise HasherBusy()
+
+    def _discard(self, pool):
+        # A pool process died (OOM killer, segfault) and the executor will
+        # refuse all further work; the next caller builds a fresh one.
+        with self.pool_lock:
+            if self.pool is pool:
+                self.pool = None
+        pool.shutdown(wait=False)
+
+    def _release(self, future):
+        self.slots.release()
+
+    @staticmethod
+    def mp_context():
+        # The web worker already runs the catalog watcher and log writer
+        # threads; forking it could copy a lock some thread is holding. The
+        # fork server is a clean single-threaded process with bcrypt loaded.
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['auth'])
+        return context
+
+    def generate_password_hash(self, password):
+        return self._submit(_hash_password, password, self.log_rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        return self._submit(_check_password, pw_hash, password)
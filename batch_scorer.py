@@ -0,0 +1,88 @@
+import numpy as np
+
+import long_responses as long
+from intent_index import stemmer
+
+
+class BatchScorer:
+    """Scores many tokenized messages against an IntentIndex at once.
+
+    The index's posting lists already form a sparse vocabulary-by-intent
+    matrix in CSR layout, so the scorer only widens them into NumPy arrays
+    once per catalog and never touches individual intents in Python.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.postings_offsets = np.frombuffer(index.postings_offsets, dtype=np.uint32).astype(np.int64)
+        self.postings = np.frombuffer(index.postings, dtype=np.uint32).astype(np.int64)
+        self.required_offsets = np.frombuffer(index.required_offsets, dtype=np.uint32).astype(np.int64)
+        self.required = np.frombuffer(index.required, dtype=np.uint32).astype(np.int64)
+        self.recognised_count = np.frombuffer(index.recognised_count, dtype=np.uint32).astype(np.float64)
+        self.single_response = np.frombuffer(index.single_response, dtype=np.uint32).astype(bool)
+
+    def vectorize(self, messages):
+        """Map tokenized messages to (message number, vocab id) pairs, one per known token."""
+        stems = {}
+        vocab_ids = {}
+        rows, cols = [], []
+        for row, message in enumerate(messages):
+            for word in message:
+                stem = stems.get(word)
+                if stem is None:
+                    stem = stems[word] = stemmer.stem(word)
+                if stem not in vocab_ids:
+                    vocab_ids[stem] = self.index.lookup(stem)
+                vocab_id = vocab_ids[stem]
+                if vocab_id is not None:
+                    rows.append(row)
+                    cols.append(vocab_id)
+        return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+    def score(self, messages):
+        """Return (message numbers, intent ids, percentages) for every non-zero pair."""
+        rows, cols = self.vectorize(messages)
+        n_intents = len(self.index)
+
+        # Expand each token occurrence into the intents that recognise it.
+        lengths = self.postings_offsets[cols + 1] - self.postings_offsets[cols]
+        starts = np.repeat(self.postings_offsets[cols] - np.cumsum(lengths) + lengths, lengths)
+        intents = self.postings[starts + np.arange(lengths.sum())]
+        keys, counts = np.unique(np.repeat(rows, lengths) * n_intents + intents, return_counts=True)
+        pair_rows, pair_intents = keys // n_intents, keys % n_intents
+
+        # Required-word mask: every required vocab id of the intent has to be
+        # among the message's vocab ids.
+        vocab_size = self.index.vocab_size
+        present = np.unique(rows * vocab_size + cols)
+        required_lengths = self.required_offsets[pair_intents + 1] - self.required_offsets[pair_intents]
+        required_starts = np.repeat(self.required_offsets[pair_intents] - np.cumsum(required_lengths)
+                                    + required_lengths, required_lengths)
+        required = self.required[required_starts + np.arange(required_lengths.sum())]
+        wanted = np.repeat(pair_rows, required_lengths) * vocab_size + required
+        found = present[np.minimum(np.searchsorted(present, wanted), len(present) - 1)] == wanted
+        missing = np.bincount(np.repeat(np.arange(len(keys)), required_lengths), weights=~found,
+                              minlength=len(keys))
+        allowed = (missing == 0) | self.single_response[pair_intents]
+
+        # Same float operations as the original message_probability, then int() truncation.
+        percentages = (counts.astype(np.float64) / self.recognised_count[pair_intents] * 100).astype(np.int64)
+        keep = allowed & (percentages > 0)
+        return pair_rows[keep], pair_intents[keep], percentages[keep]
+
+    def match(self, messages):
+        """Return (intent ids, percentages); -1 and 0 where nothing scores."""
+        best_intents = np.full(len(messages), -1, dtype=np.int64)
+        best_scores = np.zeros(len(messages), dtype=np.int64)
+        rows, intents, percentages = self.score(messages)
+        if len(rows):
+            # Highest percentage first, lowest intent id on ties, like max() did.
+            order = np.lexsort((intents, -percentages, rows))
+            first = order[np.r_[True, rows[order][1:] != rows[order][:-1]]]
+            best_intents[rows[first]] = intents[first]
+            best_scores[rows[first]] = percentages[first]
+        return best_intents, best_scores
+
+    def respond(self, messages):
+        intents, _ = self.match(messages)
+        return [long.unknown() if intent_id < 0 else self.index.response(intent_id) for intent_id in intents.tolist()]
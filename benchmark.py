@@ -0,0 +1,171 @@
+"""Scaling benchmark for get_response on synthetic intent catalogs.
+
+    python benchmark.py            # run and compare against benchmark_baseline.json
+    python benchmark.py --record   # run and store the results as the new baseline
+
+Each size gets a generated catalog and message corpus (fixed seed). Messages
+are answered once with the response cache disabled, which is the scoring
+cost, and once more with it enabled, which is the repeated-question cost.
+Any p50 latency, throughput or heap figure that is worse than the baseline by
+more than --tolerance makes the run exit with status 1.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from chatbot import Chatbot
+
+SIZES = (50, 500, 5000, 50000)
+MESSAGES = 2000
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+SYLLABLES = ('ba', 'ko', 'ri', 'tu', 'me', 'sa', 'lo', 'fin', 'den', 'par', 'vel', 'mor', 'tax', 'lon', 'gra')
+SUFFIXES = ('', '', 's', 'ing', 'ed', 'ment', 'er')
+
+
+def synthetic_vocabulary(size, rnd):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))) + rnd.choice(SUFFIXES))
+    return sorted(words)
+
+
+def synthetic_intents(count, rnd):
+    vocabulary = synthetic_vocabulary(max(500, count * 3), rnd)
+    intents = []
+    for intent_id in range(count):
+        words = rnd.sample(vocabulary, rnd.randint(2, 5))
+        single_response = rnd.random() < 0.1
+        required_words = [] if single_response else rnd.sample(words, rnd.randint(1, min(2, len(words))))
+        intents.append(('Synthetic answer %d' % intent_id, words, single_response, required_words,
+                        'synthetic-%d' % intent_id))
+    return intents, vocabulary
+
+
+def synthetic_messages(intents, vocabulary, count, rnd):
+    # Popular intents are asked far more often, as on the real /get traffic.
+    weights = [1.0 / (rank + 1) for rank in range(len(intents))]
+    messages = []
+    for _ in range(count):
+        noise = rnd.sample(vocabulary, rnd.randint(0, 3))
+        if rnd.random() < 0.7:
+            _, words, _, _, _ = rnd.choices(intents, weights)[0]
+            noise += rnd.sample(words, rnd.randint(1, len(words)))
+        rnd.shuffle(noise)
+        messages.append(' '.join(noise) + rnd.choice(('', '?', '!', '.')))
+    return messages
+
+
+def make_chatbot(directory, cache_entries):
+    config = {'CATALOG_SOURCE': os.path.join(directory, 'intents.json'),
+              'CATALOG_ARTIFACT': os.path.join(directory, 'intents.idx'), 'CATALOG_WATCH_INTERVAL': 0,
+              'PRELOAD': False, 'RESPONSE_CACHE_ENTRIES': cache_entries, 'RESPONSE_CACHE_BYTES': 64 * 1024 * 1024,
+              'RESPONSE_CACHE_TTL': 0, 'STEM_MEMO_ENTRIES': 50000, 'SEMANTIC_FALLBACK': False}
+    chatbot = Chatbot()
+    chatbot.init_app(SimpleNamespace(config=config))
+    return chatbot
+
+
+def measure(chatbot, messages):
+    latencies = []
+    started = time.perf_counter()
+    for message in messages:
+        t0 = time.perf_counter()
+        chatbot.get_response(message)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {'p50_us': latencies[len(latencies) // 2] * 1e6,
+            'p99_us': latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1e6,
+            'msgs_per_sec': len(messages) / elapsed}
+
+
+def run_size(size):
+    rnd = random.Random(size)
+    intents, vocabulary = synthetic_intents(size, rnd)
+    messages = synthetic_messages(intents, vocabulary, MESSAGES, rnd)
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'intents.json'), 'w', encoding='utf-8') as f:
+            json.dump([{'id': key, 'response': response, 'words': words, 'single_response': single_response,
+                        'required_words': required_words}
+                       for response, words, single_response, required_words, key in intents], f)
+
+        started = time.perf_counter()
+        uncached = make_chatbot(directory, 0)
+        result = {'compile_seconds': time.perf_counter() - started,
+                  'artifact_bytes': os.path.getsize(os.path.join(directory, 'intents.idx'))}
+        result['uncached'] = measure(uncached, messages)
+        # A separate pass, since tracing allocations slows everything down.
+        tracemalloc.start()
+        measure(uncached, messages)
+        result['heap_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        cached = make_chatbot(directory, 100000)
+        measure(cached, messages)
+        result['cached'] = measure(cached, messages)
+    return result
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for size, result in results.items():
+        previous = baseline.get(size)
+        if previous is None:
+            continue
+        for mode in ('uncached', 'cached'):
+            if result[mode]['p50_us'] > previous[mode]['p50_us'] * tolerance:
+                found.append('%s intents, %s p50: %.1fus vs baseline %.1fus'
+                             % (size, mode, result[mode]['p50_us'], previous[mode]['p50_us']))
+            if result[mode]['msgs_per_sec'] < previous[mode]['msgs_per_sec'] / tolerance:
+                found.append('%s intents, %s throughput: %.0f msgs/s vs baseline %.0f msgs/s'
+                             % (size, mode, result[mode]['msgs_per_sec'], previous[mode]['msgs_per_sec']))
+        if result['heap_peak_bytes'] > previous['heap_peak_bytes'] * tolerance:
+            found.append('%s intents, heap peak: %d bytes vs baseline %d bytes'
+                         % (size, result['heap_peak_bytes'], previous['heap_peak_bytes']))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--record', action='store_true', help='overwrite the baseline with this run')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='allowed slowdown factor (default 1.5)')
+    parser.add_argument('--baseline', default=BASELINE)
+    args = parser.parse_args()
+
+    results = {}
+    print('%8s %10s %10s | %9s %9s %11s | %9s %11s | %10s' % (
+        'intents', 'compile s', 'idx bytes', 'p50 us', 'p99 us', 'msgs/s', 'hit p50', 'hit msgs/s', 'heap peak'))
+    for size in args.sizes:
+        result = results[str(size)] = run_size(size)
+        print('%8d %10.2f %10d | %9.1f %9.1f %11.0f | %9.1f %11.0f | %10d' % (
+            size, result['compile_seconds'], result['artifact_bytes'], result['uncached']['p50_us'],
+            result['uncached']['p99_us'], result['uncached']['msgs_per_sec'], result['cached']['p50_us'],
+            result['cached']['msgs_per_sec'], result['heap_peak_bytes']))
+
+    if args.record:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+            f.write('\n')
+        print('Baseline written to %s' % args.baseline)
+        return
+    if not os.path.exists(args.baseline):
+        print('No baseline at %s; run with --record first.' % args.baseline)
+        return
+    with open(args.baseline) as f:
+        found = regressions(results, json.load(f), args.tolerance)
+    for line in found:
+        print('REGRESSION: ' + line)
+    if found:
+        sys.exit(1)
+    print('No regressions against %s (tolerance %.1fx).' % (args.baseline, args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
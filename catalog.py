@@ -0,0 +1,143 @@
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+
+from intent_index import IntentIndex, compile_intents
+
+CATALOG_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intents.json')
+CATALOG_ARTIFACT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intents.idx')
+CATALOG_EMBEDDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intents.emb.npz')
+
+log = logging.getLogger(__name__)
+
+
+def is_word_list(value):
+    return isinstance(value, list) and all(isinstance(word, str) for word in value)
+
+
+def load_intents(source=CATALOG_SOURCE):
+    with open(source, encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError('%s: expected a list of intents' % source)
+    keys = set()
+    for number, entry in enumerate(entries):
+        # Caught here, so a bad edit is reported instead of failing deep inside compile_intents.
+        if not isinstance(entry, dict) or not isinstance(entry.get('id'), str) or not entry['id']:
+            raise ValueError('%s: intent %d needs an "id" string' % (source, number))
+        if entry['id'] in keys:
+            raise ValueError('%s: intent %d repeats the id "%s"' % (source, number, entry['id']))
+        keys.add(entry['id'])
+        if not isinstance(entry.get('response'), str):
+            raise ValueError('%s: intent %d needs a "response" string' % (source, number))
+        if not is_word_list(entry.get('words')) or not entry['words']:
+            raise ValueError('%s: intent %d needs a non-empty "words" list of strings' % (source, number))
+        if not is_word_list(entry.get('required_words', [])):
+            raise ValueError('%s: intent %d has a "required_words" that is not a list of strings' % (source, number))
+        if not isinstance(entry.get('single_response', False), bool):
+            raise ValueError('%s: intent %d has a "single_response" that is not true or false' % (source, number))
+    return [(entry['response'], entry['words'], entry.get('single_response', False), entry.get('required_words', []),
+             entry['id']) for entry in entries]
+
+
+def atomic_write(path, write):
+    """Call write(f) on a temporary binary file, then rename it over path."""
+    # Written next to the target and renamed over it, so readers only ever see
+    # a complete file and workers still mapping the old one keep their inode.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.%s-' % os.path.basename(path),
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            os.fchmod(f.fileno(), 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def compile_catalog(source=CATALOG_SOURCE, artifact=CATALOG_ARTIFACT):
+    data = compile_intents(load_intents(source))
+    atomic_write(artifact, lambda f: f.write(data))
+
+
+def is_stale(source=CATALOG_SOURCE, artifact=CATALOG_ARTIFACT):
+    try:
+        return os.stat(artifact).st_mtime_ns < os.stat(source).st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+
+def open_catalog(source=CATALOG_SOURCE, artifact=CATALOG_ARTIFACT):
+    """Map the compiled catalog, recompiling it first when the source is newer."""
+    if is_stale(source, artifact):
+        compile_catalog(source, artifact)
+    with open(artifact, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return IntentIndex(buffer)
+    except ValueError:
+        # Left behind by an older build or another machine; rebuild it.
+        compile_catalog(source, artifact)
+        return open_catalog(source, artifact)
+
+
+class CatalogWatcher(threading.Thread):
+    """Polls the catalog files and hands a freshly mapped index to on_reload.
+
+    Requests already running keep the index object they started with, so a
+    swap never disturbs them; the old mapping is released once they finish.
+    """
+
+    def __init__(self, on_reload, source=CATALOG_SOURCE, artifact=CATALOG_ARTIFACT, interval=2.0):
+        super().__init__(name='catalog-watcher', daemon=True)
+        self.on_reload = on_reload
+        self.source = source
+        self.artifact = artifact
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.signature = self._signature()
+
+    def _signature(self):
+        signature = []
+        for path in (self.source, self.artifact):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return signature
+
+    def check(self):
+        signature = self._signature()
+        if signature == self.signature:
+            return False
+        # Recorded before compiling, so a broken save is reported once and
+        # the next save is tried again.
+        self.signature = signature
+        index = open_catalog(self.source, self.artifact)
+        self.signature = self._signature()
+        self.on_reload(index)
+        return True
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # A half-edited intents.json, or anything else: keep serving
+                # the current catalog and keep watching for the next save.
+                log.exception('Catalog reload failed')
+
+    def stop(self):
+        self.stopped.set()
+
+
+if __name__ == '__main__':
+    # Build step: compile the artifact ahead of time so workers only map it.
+    compile_catalog()
+    index = open_catalog()
+    print('Compiled %d intents, %d words into %s' % (len(index), index.vocab_size, CATALOG_ARTIFACT))
@@ -0,0 +1,173 @@
+import os
+from time import perf_counter
+
+import long_responses as long
+from catalog import CATALOG_ARTIFACT, CATALOG_SOURCE, CatalogWatcher, open_catalog
+from intent_index import stemmer, tokenize
+from metrics import ChatMetrics
+from response_cache import MISSING, ResponseCache
+
+
+class Chatbot:
+    """Holds the mapped intent catalog and everything derived from it.
+
+    Configured from the Flask app by init_app. The catalog watcher is a
+    thread, so it is started lazily in whichever process answers the first
+    message: with a preloading server the catalog is mapped once in the
+    master and the workers fork before any thread exists.
+    """
+
+    def __init__(self):
+        self.intent_index = None
+        self._batch_scorer = None
+        self.response_cache = None
+        self.semantic = None
+        self.source = CATALOG_SOURCE
+        self.artifact = CATALOG_ARTIFACT
+        self.watch_interval = None
+        self.watcher = None
+        self.watcher_pid = None
+        self.metrics = ChatMetrics()
+        self.metrics.registry.collector(self.collect_stats)
+
+    def init_app(self, app):
+        self.source = app.config['CATALOG_SOURCE']
+        self.artifact = app.config['CATALOG_ARTIFACT']
+        self.watch_interval = app.config['CATALOG_WATCH_INTERVAL']
+        self.response_cache = ResponseCache(app.config['RESPONSE_CACHE_ENTRIES'], app.config['RESPONSE_CACHE_BYTES'],
+                                            app.config['RESPONSE_CACHE_TTL'], app.config['STEM_MEMO_ENTRIES'])
+        if app.config['SEMANTIC_FALLBACK']:
+            # NumPy and the model are only paid for when the fallback is on.
+            from semantic import SemanticFallback
+            self.semantic = SemanticFallback.from_config(app.config)
+        self.swap_catalog(open_catalog(self.source, self.artifact))
+        if app.config['PRELOAD']:
+            self.warm()
+
+    def warm(self):
+        """Do the first-message work up front so forked workers inherit it."""
+        stemmer.stem('warm')
+        self.batch_scorer.respond([tokenize('hello')])
+
+    def swap_catalog(self, index):
+        self.intent_index = index
+        self._batch_scorer = None
+
+    @property
+    def batch_scorer(self):
+        scorer = self._batch_scorer
+        if scorer is None or scorer.index is not self.intent_index:
+            # NumPy is only paid for by processes that score batches.
+            from batch_scorer import BatchScorer
+            scorer = self._batch_scorer = BatchScorer(self.intent_index)
+        return scorer
+
+    def collect_stats(self):
+        if self.response_cache is None:
+            return []
+        cache = self.response_cache.stats()
+        stem_memo = cache['stem_memo']
+        return [
+            ('finbot_catalog_intents', 'gauge', 'Intents in the mapped catalog.', len(self.intent_index)),
+            ('finbot_response_cache_entries', 'gauge', 'Entries in the response cache.', cache['entries']),
+            ('finbot_response_cache_bytes', 'gauge', 'Estimated size of the response cache.', cache['bytes']),
+            ('finbot_response_cache_hits_total', 'counter', 'Response cache hits.', cache['hits']),
+            ('finbot_response_cache_misses_total', 'counter', 'Response cache misses.', cache['misses']),
+            ('finbot_response_cache_evictions_total', 'counter', 'Entries evicted for size.', cache['evictions']),
+            ('finbot_response_cache_expirations_total', 'counter', 'Entries expired by TTL.', cache['expirations']),
+            ('finbot_response_cache_invalidations_total', 'counter', 'Cache flushes on catalog swaps.',
+             cache['invalidations']),
+            ('finbot_stem_memo_hits_total', 'counter', 'Stem memo hits.', stem_memo['hits']),
+            ('finbot_stem_memo_misses_total', 'counter', 'Stem memo misses.', stem_memo['misses']),
+        ] + self.collect_semantic_stats()
+
+    def collect_semantic_stats(self):
+        if self.semantic is None:
+            return []
+        semantic = self.semantic.stats()
+        return [
+            ('finbot_semantic_ready', 'gauge', 'Whether the semantic fallback has embedded the current catalog.',
+             int(semantic['ready'])),
+            ('finbot_semantic_matches_total', 'counter', 'Low keyword scores answered by the semantic fallback.',
+             semantic['matches']),
+            ('finbot_semantic_misses_total', 'counter', 'Semantic lookups with no intent close enough.',
+             semantic['misses']),
+            ('finbot_semantic_timeouts_total', 'counter', 'Semantic lookups abandoned after the timeout.',
+             semantic['timeouts']),
+            ('finbot_semantic_skipped_total', 'counter', 'Semantic lookups skipped while warming up or saturated.',
+             semantic['skipped']),
+            ('finbot_semantic_batches_total', 'counter', 'Forward passes run by the semantic fallback.',
+             semantic['batches']),
+            ('finbot_semantic_batched_messages_total', 'counter', 'Messages embedded across all batches.',
+             semantic['batched']),
+        ]
+
+    def ensure_watcher(self):
+        if self.watcher_pid == os.getpid() or not self.watch_interval:
+            return
+        self.watcher_pid = os.getpid()
+        self.watcher = CatalogWatcher(self.swap_catalog, self.source, self.artifact, self.watch_interval)
+        self.watcher.start()
+
+    def answer(self, user_input):
+        """Return (response, intent, percentage) for a raw message."""
+        started = perf_counter()
+        message = tokenize(user_input)
+        self.metrics.observe_stage('tokenize', perf_counter() - started)
+        return self.match(message, started)
+
+    def match(self, message, started=None):
+        """Return (response, intent, percentage).
+
+        intent is the matched entry's "id" from intents.json, which unlike its
+        position survives catalog edits; it is None for the unknown fallback.
+        """
+        self.ensure_watcher()
+        observe_stage = self.metrics.observe_stage
+        index = self.intent_index
+        if self.semantic is not None:
+            self.semantic.ensure_worker(index)
+        t0 = perf_counter()
+        stemmed_message, key = self.response_cache.key(message)
+        t1 = perf_counter()
+        observe_stage('stem', t1 - t0)
+        match = self.response_cache.get(key, index)
+        t2 = perf_counter()
+        observe_stage('cache', t2 - t1)
+        if match is MISSING:
+            scores = index.score(stemmed_message)
+            t3 = perf_counter()
+            match = index.select(scores)
+            t4 = perf_counter()
+            observe_stage('score', t3 - t2)
+            observe_stage('select', t4 - t3)
+            cacheable = True
+            if self.semantic is not None and match[1] < self.semantic.threshold:
+                semantic_match = self.semantic.match(message, index)
+                observe_stage('semantic', perf_counter() - t4)
+                if semantic_match is None:
+                    # Not warm yet or timed out; let the next identical message try again.
+                    cacheable = False
+                elif semantic_match[0] is not None:
+                    match = semantic_match
+            if cacheable:
+                self.response_cache.put(key, match, index)
+            t2 = perf_counter()
+        intent_id, percentage = match
+        response = long.unknown() if intent_id is None else index.response(intent_id)
+        finished = perf_counter()
+        observe_stage('render', finished - t2)
+        self.metrics.response_seconds.observe(finished - (t0 if started is None else started))
+        intent = index.key(intent_id)
+        self.metrics.observe_match(intent)
+        return response, intent, percentage
+
+    def check_all_messages(self, message):
+        return self.match(message)[0]
+
+    def get_response(self, user_input):
+        return self.answer(user_input)[0]
+
+    def get_batch_response(self, user_inputs):
+        self.ensure_watcher()
+        return self.batch_scorer.respond([tokenize(user_input) for user_input in user_inputs])
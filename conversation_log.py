@@ -0,0 +1,144 @@
+import atexit
+from collections import deque
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets the log writer commit while request threads keep reading;
+    # NORMAL only fsyncs at checkpoints, which is safe in WAL mode.
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
+
+class ConversationLog:
+    """Write-behind log of chat sessions and messages.
+
+    Requests only append a row to a bounded in-memory queue. A writer thread
+    inserts queued rows in one transaction per batch, and whatever is still
+    queued is flushed at interpreter exit. When the queue is full, new rows
+    are dropped and counted rather than slowing /get down.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.app = None
+        self.db = None
+        self.session_table = None
+        self.message_table = None
+        self.max_pending = 10000
+        self.batch_size = 500
+        self.flush_interval = 1.0
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.writer = None
+        self.writer_pid = None
+        self.stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def init_app(self, app, db, session_model, message_model):
+        self.enabled = app.config['CONVERSATION_LOG']
+        self.app = app
+        self.db = db
+        self.session_table = session_model.__table__
+        self.message_table = message_model.__table__
+        self.max_pending = app.config['CONVERSATION_LOG_MAX_PENDING']
+        self.batch_size = app.config['CONVERSATION_LOG_BATCH_SIZE']
+        self.flush_interval = app.config['CONVERSATION_LOG_FLUSH_INTERVAL']
+        if self.enabled:
+            with app.app_context():
+                db.create_all()
+            atexit.register(self.close)
+
+    def log_session(self, session_id, user_id, started_at):
+        self._put(self.session_table, {'id': session_id, 'user_id': user_id, 'started_at': started_at})
+
+    def log_message(self, session_id, user_id, created_at, user_input, intent, score, score_ms, total_ms):
+        self._put(self.message_table, {'session_id': session_id, 'user_id': user_id, 'created_at': created_at,
+                                       'user_input': user_input, 'intent': intent, 'score': score,
+                                       'score_ms': score_ms, 'total_ms': total_ms})
+
+    def _put(self, table, row):
+        if not self.enabled:
+            return
+        self.ensure_writer()
+        with self.condition:
+            if len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self.pending.append((table, row))
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+
+    def ensure_writer(self):
+        # Started per process, like the catalog watcher, so it survives forking.
+        if self.writer_pid == os.getpid():
+            return
+        self.writer_pid = os.getpid()
+        self.stopping = False
+        self.writer = threading.Thread(target=self._run, name='conversation-log', daemon=True)
+        self.writer.start()
+
+    def _take(self):
+        batch = []
+        while self.pending and len(batch) < self.batch_size:
+            batch.append(self.pending.popleft())
+        return batch
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if len(self.pending) < self.batch_size and not self.stopping:
+                    self.condition.wait(self.flush_interval)
+                batch = self._take()
+                if not batch and self.stopping:
+                    return
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        # Sessions go in before their messages; within a table, order is kept.
+        sessions = [row for table, row in batch if table is self.session_table]
+        messages = [row for table, row in batch if table is self.message_table]
+        try:
+            with self.app.app_context():
+                with self.db.engine.begin() as connection:
+                    if sessions:
+                        connection.execute(self.session_table.insert(), sessions)
+                    if messages:
+                        connection.execute(self.message_table.insert(), messages)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            log.exception('Conversation log write failed, %d rows lost', len(batch))
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        while True:
+            with self.condition:
+                batch = self._take()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self):
+        writer = self.writer
+        if writer is not None and writer.is_alive() and self.writer_pid == os.getpid():
+            with self.condition:
+                self.stopping = True
+                self.condition.notify()
+            writer.join(10)
+        self.flush()
+
+    def stats(self):
+        return {'pending': len(self.pending), 'written': self.written, 'dropped': self.dropped,
+                'failed': self.failed}
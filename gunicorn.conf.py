@@ -0,0 +1,8 @@
+# gunicorn -c gunicorn.conf.py
+# The app is built once in the master (catalog mapped, stemmer and NumPy
+# scorer warmed) and workers fork from it, sharing those pages copy-on-write.
+import multiprocessing
+
+wsgi_app = "app:create_app({'PRELOAD': True})"
+preload_app = True
+workers = multiprocessing.cpu_count() * 2 + 1
@@ -0,0 +1,225 @@
+from array import array
+import re
+import struct
+import sys
+
+import long_responses as long
+
+
+class LazyStemmer:
+    """PorterStemmer that imports nltk on the first stem() call.
+
+    Importing nltk is a large share of startup; the first call replaces
+    stem() on the instance with the real bound method.
+    """
+
+    def stem(self, word):
+        from nltk.stem import PorterStemmer
+        self.stem = PorterStemmer().stem
+        return self.stem(word)
+
+
+stemmer = LazyStemmer()
+
+MAGIC = b'FBIX'
+VERSION = 2
+# Every u32 section is addressed as (byte offset, item count); the blobs
+# come last so the arrays before them stay 4-byte aligned.
+SECTIONS = ('vocab_offsets', 'postings_offsets', 'postings', 'recognised_count', 'single_response',
+            'required_offsets', 'required', 'response_offsets', 'key_offsets', 'vocab_blob', 'response_blob',
+            'key_blob')
+BLOBS = 3
+HEADER = struct.Struct('<4sII' + 'II' * len(SECTIONS))
+BYTE_ORDER = {'little': 1, 'big': 2}
+
+
+def tokenize(user_input):
+    return re.split(r'\s+|[,;?!.-]\s*', user_input.lower())
+
+
+def stem_words(words):
+    return [stemmer.stem(word) for word in words]
+
+
+def compile_intents(intents):
+    """Compile (response, words, single_response, required_words, key) tuples into an index artifact.
+
+    The key is the intent's stable name; intent ids are only positions and
+    shift whenever the catalog is edited.
+    """
+    specs = []
+    positions = {}
+    for bot_response, list_of_words, single_response, required_words, key in intents:
+        # check_all_messages kept its scores in a dict keyed on the response
+        # text, so a repeated response replaces the earlier entry in place.
+        spec = (bot_response, set(list_of_words), len(list_of_words), set(stem_words(required_words)),
+                single_response, key)
+        if bot_response in positions:
+            specs[positions[bot_response]] = spec
+        else:
+            positions[bot_response] = len(specs)
+            specs.append(spec)
+
+    # Recognised words are matched unstemmed and required words stemmed, but
+    # both are plain strings compared against stemmed message words, so they
+    # share one sorted vocabulary.
+    vocab = sorted({word for spec in specs for word in spec[1] | spec[3]}, key=lambda word: word.encode('utf-8'))
+    vocab_ids = {word: vocab_id for vocab_id, word in enumerate(vocab)}
+    postings = [[] for _ in vocab]
+    for intent_id, (_, recognised_words, _, _, _, _) in enumerate(specs):
+        for word in recognised_words:
+            postings[vocab_ids[word]].append(intent_id)
+
+    sections = {name: array('I') for name in SECTIONS[:-BLOBS]}
+    vocab_blob = bytearray()
+    response_blob = bytearray()
+    key_blob = bytearray()
+    sections['vocab_offsets'].append(0)
+    sections['postings_offsets'].append(0)
+    for word, intent_ids in zip(vocab, postings):
+        vocab_blob += word.encode('utf-8')
+        sections['vocab_offsets'].append(len(vocab_blob))
+        sections['postings'].extend(intent_ids)
+        sections['postings_offsets'].append(len(sections['postings']))
+    sections['required_offsets'].append(0)
+    sections['response_offsets'].append(0)
+    sections['key_offsets'].append(0)
+    for bot_response, _, recognised_count, required_words, single_response, key in specs:
+        sections['recognised_count'].append(recognised_count)
+        sections['single_response'].append(1 if single_response else 0)
+        sections['required'].extend(sorted(vocab_ids[word] for word in required_words))
+        sections['required_offsets'].append(len(sections['required']))
+        response_blob += bot_response.encode('utf-8')
+        sections['response_offsets'].append(len(response_blob))
+        key_blob += key.encode('utf-8')
+        sections['key_offsets'].append(len(key_blob))
+    sections['vocab_blob'] = vocab_blob
+    sections['response_blob'] = response_blob
+    sections['key_blob'] = key_blob
+
+    layout = []
+    body = bytearray()
+    for name in SECTIONS:
+        data = sections[name]
+        layout += [HEADER.size + len(body), len(data)]
+        body += data.tobytes() if isinstance(data, array) else data
+    return HEADER.pack(MAGIC, VERSION, BYTE_ORDER[sys.byteorder], *layout) + bytes(body)
+
+
+class IntentIndex:
+    """Read-only view over a compiled intent artifact.
+
+    The buffer is usually an mmap of the artifact, so workers share one copy
+    of the catalog. Scores exactly like the original per-intent loop (kept as
+    the reference in tests/test_intent_index.py): stemmed message words are
+    matched against the *unstemmed* recognised words, while required words
+    are stemmed before being looked up in the message.
+    """
+
+    def __init__(self, buffer):
+        magic, version, byte_order, *layout = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a FinBot intent index (version %d)' % VERSION)
+        if byte_order != BYTE_ORDER[sys.byteorder]:
+            raise ValueError('Intent index was compiled on a machine with a different byte order')
+
+        self.buffer = buffer
+        view = memoryview(buffer)
+        sections = dict(zip(SECTIONS, zip(layout[::2], layout[1::2])))
+        for name in SECTIONS[:-BLOBS]:
+            offset, count = sections[name]
+            setattr(self, name, view[offset:offset + 4 * count].cast('I'))
+        self.vocab_start = sections['vocab_blob'][0]
+        self.response_start = sections['response_blob'][0]
+        self.key_start = sections['key_blob'][0]
+
+    @classmethod
+    def from_intents(cls, intents):
+        return cls(compile_intents(intents))
+
+    def __len__(self):
+        return len(self.recognised_count)
+
+    @property
+    def vocab_size(self):
+        return len(self.vocab_offsets) - 1
+
+    def word(self, vocab_id):
+        start = self.vocab_start
+        return self.buffer[start + self.vocab_offsets[vocab_id]:start + self.vocab_offsets[vocab_id + 1]].decode('utf-8')
+
+    def lookup(self, word):
+        """Return the vocabulary id of word, or None."""
+        key = word.encode('utf-8')
+        start = self.vocab_start
+        offsets = self.vocab_offsets
+        lo, hi = 0, len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.buffer[start + offsets[mid]:start + offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(offsets) - 1 and self.buffer[start + offsets[lo]:start + offsets[lo + 1]] == key:
+            return lo
+        return None
+
+    def postings_for(self, vocab_id):
+        return self.postings[self.postings_offsets[vocab_id]:self.postings_offsets[vocab_id + 1]]
+
+    def required_for(self, intent_id):
+        return self.required[self.required_offsets[intent_id]:self.required_offsets[intent_id + 1]]
+
+    def response(self, intent_id):
+        start = self.response_start
+        return self.buffer[start + self.response_offsets[intent_id]:
+                           start + self.response_offsets[intent_id + 1]].decode('utf-8')
+
+    def key(self, intent_id):
+        """Return the stable name of an intent, or None for None."""
+        if intent_id is None:
+            return None
+        start = self.key_start
+        return self.buffer[start + self.key_offsets[intent_id]:start + self.key_offsets[intent_id + 1]].decode('utf-8')
+
+    def score(self, stemmed_message):
+        """Return {intent_id: percentage} for intents sharing a word with the message."""
+        vocab_ids = {word: self.lookup(word) for word in set(stemmed_message)}
+        counts = {}
+        for word in stemmed_message:
+            vocab_id = vocab_ids[word]
+            if vocab_id is not None:
+                for intent_id in self.postings_for(vocab_id):
+                    counts[intent_id] = counts.get(intent_id, 0) + 1
+
+        message_words = set(vocab_ids.values())
+        scores = {}
+        for intent_id, message_certainty in counts.items():
+            if self.single_response[intent_id] or all(vocab_id in message_words
+                                                      for vocab_id in self.required_for(intent_id)):
+                percentage = float(message_certainty) / float(self.recognised_count[intent_id])
+                scores[intent_id] = int(percentage * 100)
+        return scores
+
+    def match(self, message):
+        """Return (intent_id, percentage) of the best intent, or (None, 0) when nothing scores."""
+        return self.match_stemmed(stem_words(message))
+
+    def match_stemmed(self, stemmed_message):
+        return self.select(self.score(stemmed_message))
+
+    @staticmethod
+    def select(scores):
+        """Pick the best (intent_id, percentage) out of score()'s result."""
+        best_id, best_score = None, 0
+        for intent_id, percentage in scores.items():
+            # max() over the old dict kept the first of equal scores, i.e. the lowest id.
+            if percentage > best_score or (percentage == best_score and best_id is not None and intent_id < best_id):
+                best_id, best_score = intent_id, percentage
+        if best_score < 1:
+            return None, 0
+        return best_id, best_score
+
+    def respond(self, message):
+        intent_id, _ = self.match(message)
+        return long.unknown() if intent_id is None else self.response(intent_id)
@@ -0,0 +1,161 @@
+"""Compare chat throughput and latency of the /get POST and the /ws WebSocket.
+
+--transport login measures logins/sec through the /login form instead.
+
+Start the app under an ASGI server (``uvicorn asgi:application``) and point
+this at it with an existing account:
+
+    python loadtest.py --url http://127.0.0.1:8000 --username alice --password secret123
+
+Use --http-url to aim the /get half at a WSGI deployment instead.
+"""
+import argparse
+import asyncio
+import http.client
+import http.cookiejar
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import websockets
+
+QUESTIONS = ['best ways to invest', 'credit card', 'home loan', 'how to save money', 'hello',
+             'tax saving tips India', 'what do you eat', 'this matches nothing at all']
+
+
+def login(url, username, password):
+    """Log in through the form and return the session Cookie header value."""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    page = opener.open(url + '/login').read().decode('utf-8')
+    csrf_token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
+    form = urllib.parse.urlencode({'csrf_token': csrf_token, 'username': username, 'password': password})
+    opener.open(url + '/login', form.encode('utf-8'))
+    cookie = '; '.join('%s=%s' % (c.name, c.value) for c in jar if c.name == 'session')
+    if not cookie:
+        raise SystemExit('Login failed for %r' % username)
+    return cookie
+
+
+def percentile(latencies, p):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+
+def report(name, latencies, elapsed):
+    print('%-6s %8d msgs %10.1f msgs/s   p50 %7.2f ms   p99 %7.2f ms' % (
+        name, len(latencies), len(latencies) / elapsed,
+        percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000))
+
+
+def run_http(url, cookie, clients, messages):
+    parts = urllib.parse.urlsplit(url)
+    latencies = []
+    lock = threading.Lock()
+
+    def client(n):
+        connection = http.client.HTTPConnection(parts.hostname, parts.port)
+        mine = []
+        for i in range(messages):
+            body = urllib.parse.urlencode({'msg': QUESTIONS[(n + i) % len(QUESTIONS)]})
+            started = time.perf_counter()
+            connection.request('POST', '/get', body, {'Cookie': cookie,
+                                                      'Content-Type': 'application/x-www-form-urlencoded'})
+            response = connection.getresponse()
+            response.read()
+            mine.append(time.perf_counter() - started)
+            if response.status != 200:
+                raise SystemExit('/get returned %d' % response.status)
+            if response.will_close:
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port)
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report('http', latencies, time.perf_counter() - started)
+
+
+def run_logins(url, username, password, clients, messages):
+    latencies = []
+    lock = threading.Lock()
+
+    rejected = []
+
+    def client():
+        mine = []
+        busy = 0
+        for _ in range(messages):
+            started = time.perf_counter()
+            try:
+                login(url, username, password)
+            except urllib.error.HTTPError as e:
+                if e.code != 503:
+                    raise
+                busy += 1
+                continue
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+            rejected.append(busy)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report('login', latencies, time.perf_counter() - started)
+    print('%d logins rejected with 503' % sum(rejected))
+
+
+async def run_ws(url, cookie, clients, messages):
+    latencies = []
+
+    async def client(n):
+        async with websockets.connect(url, additional_headers={'Cookie': cookie}) as socket:
+            for i in range(messages):
+                started = time.perf_counter()
+                await socket.send(json.dumps({'id': i, 'msg': QUESTIONS[(n + i) % len(QUESTIONS)]}))
+                await socket.recv()
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    report('ws', latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--http-url', help='server to send /get to (defaults to --url)')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=200, help='messages per client')
+    parser.add_argument('--transport', choices=['http', 'ws', 'both', 'login'], default='both')
+    args = parser.parse_args()
+
+    http_url = (args.http_url or args.url).rstrip('/')
+    ws_url = re.sub(r'^http', 'ws', args.url.rstrip('/')) + '/ws'
+    if args.transport == 'login':
+        run_logins(http_url, args.username, args.password, args.clients, args.messages)
+    if args.transport in ('http', 'both'):
+        run_http(http_url, login(http_url, args.username, args.password), args.clients, args.messages)
+    if args.transport in ('ws', 'both'):
+        asyncio.run(run_ws(ws_url, login(args.url.rstrip('/'), args.username, args.password),
+                           args.clients, args.messages))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,5 @@
 import random
 
-R_EATING = "I don't like eating anything because I'm a bot obviously!"
-R_ADVICE = "If I were you, I would go to the internet and type exactly what you wrote there!"
-
 
 def unknown():
     response = ["I'm sorry, I couldn't understand that. Can you please rephrase or provide more details?",
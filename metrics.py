@@ -0,0 +1,121 @@
+from bisect import bisect_left
+import threading
+
+# Seconds; the hot-path stages sit in the microsecond range.
+STAGE_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                 0.025, 0.05, 0.1)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                             for name, value in labels)
+
+
+class Counter:
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s counter' % self.name]
+        for label_values, value in sorted(self.values.items()):
+            lines.append('%s%s %s' % (self.name, format_labels(list(zip(self.label_names, label_values))), value))
+        return lines
+
+
+class Histogram:
+    """Prometheus histogram; one bisect and three adds per observation."""
+
+    def __init__(self, name, help, label_names=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum and count.
+                series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % self.name]
+        for label_values, series in sorted(self.series.items()):
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (self.name, format_labels(labels + [('le', bound)]), cumulative))
+            lines.append('%s_sum%s %r' % (self.name, format_labels(labels), series[-2]))
+            lines.append('%s_count%s %d' % (self.name, format_labels(labels), series[-1]))
+        return lines
+
+
+class Registry:
+    """Metrics plus collectors: callables returning (name, type, help, value) for stats read at scrape time."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        self.collectors.append(collect)
+        return collect
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collect in self.collectors:
+            for name, kind, help, value in collect():
+                lines += ['# HELP %s %s' % (name, help), '# TYPE %s %s' % (name, kind), '%s %s' % (name, value)]
+        return '\n'.join(lines) + '\n'
+
+
+class ChatMetrics:
+    """The chat hot-path series: per-stage timings, matches and fallbacks."""
+
+    def __init__(self, registry=None):
+        self.registry = registry or Registry()
+        self.stage_seconds = self.registry.histogram(
+            'finbot_stage_seconds', 'Time spent in each stage of answering a message.', ('stage',))
+        self.response_seconds = self.registry.histogram(
+            'finbot_response_seconds', 'Time from raw message to rendered response.')
+        self.intent_matches = self.registry.counter(
+            'finbot_intent_matches_total', 'Messages answered by each intent.', ('intent',))
+        self.unknown_responses = self.registry.counter(
+            'finbot_unknown_responses_total', 'Messages that fell through to long.unknown().')
+
+    def observe_stage(self, stage, seconds):
+        self.stage_seconds.observe(seconds, stage)
+
+    def observe_match(self, intent):
+        if intent is None:
+            self.unknown_responses.inc()
+        else:
+            self.intent_matches.inc(intent)
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+import sys
+import threading
+import time
+
+from intent_index import stemmer
+
+MISSING = object()
+# Rough per-entry cost of the OrderedDict slot, value tuple and float.
+ENTRY_OVERHEAD = 160
+
+
+class StemMemo:
+    """Bounded word -> stem memo; once full the oldest words are dropped first."""
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self.stems = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stem(self, word):
+        stem = self.stems.get(word)
+        if stem is not None:
+            self.hits += 1
+            return stem
+        self.misses += 1
+        stem = stemmer.stem(word)
+        if len(self.stems) >= self.max_entries:
+            try:
+                del self.stems[next(iter(self.stems))]
+                self.evictions += 1
+            except (StopIteration, KeyError, RuntimeError):
+                # Another thread got there first.
+                pass
+        self.stems[word] = stem
+        return stem
+
+    def stem_words(self, words):
+        return [self.stem(word) for word in words]
+
+    def stats(self):
+        return {'entries': len(self.stems), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class ResponseCache:
+    """LRU/TTL cache from a message's stemmed token multiset to its winning intent.
+
+    The (intent id, percentage) match is cached rather than response text,
+    so a cached miss still gets a fresh long.unknown() every time. The cache
+    belongs to one IntentIndex and empties itself as soon as it is asked
+    about another.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, ttl=600, stem_memo_entries=50000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stem_memo = StemMemo(stem_memo_entries)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.index = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, message):
+        """Return (stemmed message, cache key); the key ignores word order and punctuation."""
+        stemmed_message = self.stem_memo.stem_words(message)
+        # tokenize() leaves '' behind trailing punctuation; it never scores.
+        return stemmed_message, tuple(sorted(word for word in stemmed_message if word))
+
+    @staticmethod
+    def entry_size(key):
+        return sys.getsizeof(key) + sum(sys.getsizeof(word) for word in key) + ENTRY_OVERHEAD
+
+    def _bind(self, index):
+        if index is not self.index:
+            if self.index is not None:
+                self.invalidations += 1
+            self.entries.clear()
+            self.size = 0
+            self.index = index
+
+    def get(self, key, index):
+        with self.lock:
+            self._bind(index)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            match, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return match
+
+    def put(self, key, match, index):
+        size = self.entry_size(key)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            if index is not self.index:
+                # Scored against a catalog that has been swapped out meanwhile.
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (match, expires_at)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        del self.entries[key]
+        self.size -= self.entry_size(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'expirations': self.expirations,
+                'invalidations': self.invalidations, 'stem_memo': self.stem_memo.stats()}
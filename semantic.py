@@ -0,0 +1,267 @@
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from catalog import CATALOG_EMBEDDINGS, atomic_write
+
+TAG = re.compile(r'<[^>]+>')
+ENCODE_BATCH = 64
+
+log = logging.getLogger(__name__)
+
+
+def intent_texts(index):
+    """One line of text per intent: its recognised words, then the response without markup."""
+    words = [[] for _ in range(len(index))]
+    for vocab_id in range(index.vocab_size):
+        word = index.word(vocab_id)
+        for intent_id in index.postings_for(vocab_id):
+            words[intent_id].append(word)
+    return ['%s. %s' % (' '.join(intent_words), ' '.join(TAG.sub(' ', index.response(intent_id)).split()))
+            for intent_id, intent_words in enumerate(words)]
+
+
+def model_key(model_dir):
+    # Swapping the files of the model directory has to invalidate stored embeddings too.
+    mtimes = [entry.stat().st_mtime_ns for entry in os.scandir(model_dir)]
+    return '%s:%d' % (os.path.realpath(model_dir), max(mtimes, default=0))
+
+
+def load_embeddings(path, fingerprint):
+    try:
+        with np.load(path) as stored:
+            if str(stored['fingerprint']) == fingerprint:
+                return stored['embeddings']
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def save_embeddings(path, fingerprint, embeddings):
+    atomic_write(path, lambda f: np.savez(f, fingerprint=np.array(fingerprint), embeddings=embeddings))
+
+
+class TransformerEncoder:
+    """Mean-pooled, L2-normalised sentence embeddings from a local transformers model.
+
+    Nothing is downloaded: the model directory must hold a checkpoint saved
+    with save_pretrained. Linear layers are quantized to int8 for the CPU.
+    """
+
+    def __init__(self, model_dir, threads=1, max_length=128):
+        os.environ.setdefault('HF_HUB_OFFLINE', '1')
+        os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        # One thread per web worker; the workers already use every core.
+        torch.set_num_threads(threads)
+        self.torch = torch
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+        model = AutoModel.from_pretrained(model_dir, local_files_only=True).eval()
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts):
+        torch = self.torch
+        batch = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                               return_tensors='pt')
+        with torch.inference_mode():
+            hidden = self.model(**batch).last_hidden_state
+        mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        embeddings = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(embeddings, dim=1).numpy().astype(np.float32)
+
+
+class SemanticFallback:
+    """Nearest intent by sentence embedding, for messages the keywords miss.
+
+    A worker thread per process loads the model, embeds the catalog (or
+    reads the stored embeddings) and then answers queued messages in
+    micro-batches: one forward pass and one matrix product for everything
+    that arrived while the previous batch ran. Callers wait at most
+    `timeout` seconds. While the model is still warming up, or the queue is
+    full, they get None straight away and keep the keyword answer.
+    """
+
+    def __init__(self, model_dir, embeddings=CATALOG_EMBEDDINGS, threshold=50, min_similarity=0.6, timeout=0.25,
+                 max_batch=32, batch_wait=0.005, max_pending=256, threads=1, encoder_factory=TransformerEncoder):
+        self.model_dir = model_dir
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self.timeout = timeout
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.max_pending = max_pending
+        self.threads = threads
+        self.encoder_factory = encoder_factory
+        self.encoder = None
+        self.failed = False
+        self.wanted_index = None
+        self.index = None
+        self.matrix = None
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.worker = None
+        self.worker_pid = None
+        self.matches = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.batches = 0
+        self.batched = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['SEMANTIC_MODEL_DIR'], config['SEMANTIC_EMBEDDINGS'], config['SEMANTIC_THRESHOLD'],
+                   config['SEMANTIC_MIN_SIMILARITY'], config['SEMANTIC_TIMEOUT'], config['SEMANTIC_MAX_BATCH'],
+                   config['SEMANTIC_BATCH_WAIT'], config['SEMANTIC_MAX_PENDING'], config['SEMANTIC_THREADS'])
+
+    def ensure_worker(self, index):
+        """Point the worker at the current catalog, starting it in this process if needed."""
+        if index is not self.wanted_index:
+            with self.condition:
+                self.wanted_index = index
+                self.condition.notify()
+        # Per process, like the catalog watcher; the model loads in the thread, not in the request.
+        if self.worker_pid == os.getpid():
+            return
+        self.worker_pid = os.getpid()
+        self.worker = threading.Thread(target=self._run, name='semantic-fallback', daemon=True)
+        self.worker.start()
+
+    def match(self, message, index):
+        """Return (intent_id, similarity percentage), (None, 0) when no intent is close enough,
+        or None when there was no answer in time."""
+        self.ensure_worker(index)
+        if self.failed or self.index is not index:
+            self.skipped += 1
+            return None
+        future = Future()
+        with self.condition:
+            if len(self.pending) >= self.max_pending:
+                self.skipped += 1
+                return None
+            self.pending.append((' '.join(word for word in message if word), index, future))
+            self.condition.notify()
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            self.timeouts += 1
+            return None
+
+    def _run(self):
+        try:
+            self.encoder = self.encoder_factory(self.model_dir, self.threads)
+        except Exception as e:
+            # Missing torch/transformers or no model on disk: keywords only.
+            self.failed = True
+            log.warning('Semantic fallback disabled: %s', e)
+            return
+        while True:
+            with self.condition:
+                while not self.pending and self.wanted_index is self.index:
+                    self.condition.wait()
+                index = self.wanted_index
+            if index is not self.index:
+                self._load_catalog(index)
+                continue
+            with self.condition:
+                # Give concurrent requests a moment to join a batch that would otherwise hold one message.
+                deadline = time.monotonic() + self.batch_wait
+                while len(self.pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = [self.pending.popleft() for _ in range(min(self.max_batch, len(self.pending)))]
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self._answer(batch)
+
+    def _load_catalog(self, index):
+        try:
+            texts = intent_texts(index)
+            fingerprint = hashlib.sha1(('%s\n%s' % (model_key(self.model_dir), '\n'.join(texts))).encode('utf-8'))
+            fingerprint = fingerprint.hexdigest()
+            matrix = load_embeddings(self.embeddings, fingerprint)
+            if matrix is None:
+                matrix = self.embed_catalog(texts)
+                try:
+                    save_embeddings(self.embeddings, fingerprint, matrix)
+                except OSError as e:
+                    log.warning('Could not store intent embeddings: %s', e)
+        except Exception:
+            log.exception('Could not embed the intent catalog')
+            matrix = None
+        self.matrix = matrix
+        self.index = index
+
+    def embed_catalog(self, texts):
+        if not texts:
+            return None
+        return np.concatenate([self.encoder.encode(texts[start:start + ENCODE_BATCH])
+                               for start in range(0, len(texts), ENCODE_BATCH)])
+
+    def _answer(self, batch):
+        self.batches += 1
+        self.batched += len(batch)
+        matrix = self.matrix
+        try:
+            if matrix is None:
+                results = [(None, 0)] * len(batch)
+            else:
+                # Rows are unit length, so the dot product is the cosine similarity.
+                similarities = self.encoder.encode([text for text, _, _ in batch]) @ matrix.T
+                best = similarities.argmax(axis=1)
+                results = []
+                for row, intent_id in zip(similarities, best):
+                    similarity = float(row[intent_id])
+                    if similarity >= self.min_similarity:
+                        results.append((int(intent_id), int(similarity * 100)))
+                    else:
+                        results.append((None, 0))
+        except Exception:
+            log.exception('Semantic fallback failed for %d messages', len(batch))
+            results = [None] * len(batch)
+        for (_, index, future), result in zip(batch, results):
+            if result is not None and index is not self.index:
+                # Asked about a catalog that has been swapped out meanwhile.
+                result = None
+            elif result is not None and result[0] is not None:
+                self.matches += 1
+            elif result is not None:
+                self.misses += 1
+            future.set_result(result)
+
+    def stats(self):
+        return {'ready': self.index is not None and self.index is self.wanted_index, 'failed': self.failed,
+                'matches': self.matches, 'misses': self.misses, 'timeouts': self.timeouts,
+                'skipped': self.skipped, 'batches': self.batches, 'batched': self.batched,
+                'pending': len(self.pending)}
+
+
+if __name__ == '__main__':
+    # Build step: store the intent embeddings ahead of time so workers only load them.
+    import sys
+
+    from catalog import open_catalog
+
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                    'models', 'semantic')
+    fallback = SemanticFallback(model_dir)
+    fallback.encoder = TransformerEncoder(model_dir)
+    fallback._load_catalog(open_catalog())
+    if fallback.matrix is None:
+        sys.exit('No embeddings were computed')
+    print('Embedded %d intents (%d dimensions) into %s' % (fallback.matrix.shape[0], fallback.matrix.shape[1],
+                                                           CATALOG_EMBEDDINGS))
@@ -0,0 +1,38 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import load_intents  # noqa: E402
+from intent_index import IntentIndex, tokenize  # noqa: E402
+
+FILLER = ['what', 'is', 'the', 'a', 'my', 'please', 'should', 'can', 'tell', 'me', 'about', 'xyzzy']
+
+
+@pytest.fixture(scope='session')
+def intents():
+    return load_intents()
+
+
+@pytest.fixture(scope='session')
+def index(intents):
+    return IntentIndex.from_intents(intents)
+
+
+@pytest.fixture(scope='session')
+def corpus(intents):
+    """Seeded tokenized messages built from the catalog's own words, inflected, recased and padded."""
+    rnd = random.Random(2024)
+    vocabulary = sorted({word for _, words, _, required, _ in intents for word in words + required}) + FILLER
+    messages = []
+    for _ in range(1000):
+        _, words, _, required, _ = rnd.choice(intents)
+        picked = rnd.sample(words + required, rnd.randint(0, len(words + required)))
+        picked += rnd.sample(vocabulary, rnd.randint(0, 3))
+        picked = [rnd.choice((word, word + 's', word + 'ing', word.capitalize(), word.upper())) for word in picked]
+        rnd.shuffle(picked)
+        messages.append(tokenize(' '.join(picked) + rnd.choice(('', '?', '!', '.', ', please'))))
+    return messages
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+
+
+class User:
+    id = 1
+
+
+@pytest.fixture(scope='module')
+def asgi(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('FINBOT_SQLALCHEMY_DATABASE_URI', 'sqlite:///%s' % (tmp_path_factory.mktemp('asgi') / 'database.db'))
+        mp.setenv('FINBOT_CONVERSATION_LOG', 'false')
+        mp.setenv('FINBOT_CATALOG_WATCH_INTERVAL', '0')
+        import asgi
+    return asgi
+
+
+@pytest.fixture
+def looked_up(asgi, monkeypatch):
+    looked_up = []
+    monkeypatch.setattr(asgi, 'session_user_id', lambda scope: '1')
+    monkeypatch.setattr(asgi, 'find_user', lambda user_id: looked_up.append(user_id) or User())
+    return looked_up
+
+
+def run_socket(asgi, headers, frames=()):
+    """Connect, send the frames, wait for one reply each, disconnect; return what the server sent."""
+    sent = []
+
+    async def session():
+        events = [{'type': 'websocket.connect'}] + [dict(frame, type='websocket.receive') for frame in frames]
+
+        async def receive():
+            if events:
+                return events.pop(0)
+            for _ in range(200):
+                if len([m for m in sent if m['type'] == 'websocket.send']) >= len(frames):
+                    break
+                await asyncio.sleep(0.01)
+            return {'type': 'websocket.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi.chat_socket({'type': 'websocket', 'headers': headers}, receive, send)
+
+    asyncio.run(session())
+    return sent
+
+
+def replies(sent):
+    return [json.loads(message['text']) for message in sent if message['type'] == 'websocket.send']
+
+
+@pytest.mark.parametrize('headers', [
+    [(b'host', b'finbot.example'), (b'origin', b'http://finbot.example')],
+    [(b'host', b'finbot.example')],
+])
+def test_same_origin_or_no_origin_is_accepted(asgi, looked_up, headers):
+    sent = run_socket(asgi, headers, [{'text': json.dumps({'id': 1, 'msg': 'credit card'})}])
+    assert sent[0] == {'type': 'websocket.accept'}
+    assert [reply['id'] for reply in replies(sent)] == [1]
+
+
+def test_cross_origin_handshake_is_refused(asgi, looked_up):
+    sent = run_socket(asgi, [(b'host', b'finbot.example'), (b'origin', b'http://evil.example')])
+    assert sent == [{'type': 'websocket.close', 'code': asgi.CLOSE_POLICY_VIOLATION}]
+    assert looked_up == []
+    assert not asgi.connections
+
+
+def test_allowed_origin_is_accepted(asgi, looked_up, monkeypatch):
+    monkeypatch.setitem(asgi.app.config, 'WEBSOCKET_ALLOWED_ORIGINS', ['https://chat.finbot.example'])
+    sent = run_socket(asgi, [(b'host', b'finbot.example'), (b'origin', b'https://chat.finbot.example')])
+    assert sent[0] == {'type': 'websocket.accept'}
+
+
+@pytest.mark.parametrize('msg', [None, 42, ['credit', 'card']])
+def test_non_string_msg_gets_an_error(asgi, looked_up, msg):
+    sent = run_socket(asgi, [(b'host', b'finbot.example')], [{'text': json.dumps({'id': 7, 'msg': msg})}])
+    (reply,) = replies(sent)
+    assert reply['id'] == 7
+    assert 'error' in reply and 'response' not in reply
+
+
+def test_message_limit_counts_bytes(asgi, looked_up, monkeypatch):
+    monkeypatch.setitem(asgi.app.config, 'WEBSOCKET_MAX_MESSAGE_BYTES', 10)
+    sent = run_socket(asgi, [(b'host', b'finbot.example')], [{'text': '€' * 4}])
+    assert sent == [{'type': 'websocket.accept'}, {'type': 'websocket.close', 'code': asgi.CLOSE_TOO_BIG}]
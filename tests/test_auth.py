@@ -0,0 +1,44 @@
+import os
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+from auth import HasherBusy, PasswordHasher
+
+
+def make_hasher(**config):
+    hasher = PasswordHasher()
+    hasher.init_app(SimpleNamespace(config=dict({'BCRYPT_LOG_ROUNDS': 4, 'BCRYPT_POOL_WORKERS': 1,
+                                                  'BCRYPT_POOL_MAX_PENDING': 2, 'BCRYPT_POOL_TIMEOUT': 10},
+                                                 **config)))
+    return hasher
+
+
+def test_hash_and_check():
+    hasher = make_hasher()
+    pw_hash = hasher.generate_password_hash('password123')
+    assert hasher.check_password_hash(pw_hash, 'password123')
+    assert not hasher.check_password_hash(pw_hash, 'password124')
+
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes():
+    hasher = make_hasher(BCRYPT_LOG_ROUNDS=13, BCRYPT_POOL_MAX_PENDING=1, BCRYPT_POOL_TIMEOUT=0.05)
+    with pytest.raises(HasherBusy):
+        hasher.generate_password_hash('password123')
+    # The hash is still running in the pool, so there is no room for another.
+    assert not hasher.slots.acquire(blocking=False)
+    assert hasher.slots.acquire(timeout=30)
+    hasher.slots.release()
+
+
+
+def test_pool_is_rebuilt_after_a_worker_dies():
+    hasher = make_hasher()
+    pw_hash = hasher.generate_password_hash('password123')
+    for pid in list(hasher.pool._processes):
+        os.kill(pid, signal.SIGKILL)
+    with pytest.raises(HasherBusy):
+        hasher.check_password_hash(pw_hash, 'password123')
+    assert hasher.check_password_hash(pw_hash, 'password123')
+    assert hasher.slots.acquire(blocking=False) and hasher.slots.acquire(blocking=False)
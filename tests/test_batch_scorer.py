@@ -0,0 +1,43 @@
+import pytest
+
+from batch_scorer import BatchScorer
+from intent_index import stem_words, tokenize
+
+
+@pytest.fixture(scope='module')
+def scorer(index):
+    return BatchScorer(index)
+
+
+def test_batch_matches_index(index, scorer, corpus):
+    intents, percentages = scorer.match(corpus)
+    for message, intent_id, percentage in zip(corpus, intents.tolist(), percentages.tolist()):
+        expected_id, expected_percentage = index.match(message)
+        assert (None if intent_id < 0 else intent_id, percentage) == (expected_id, expected_percentage), message
+
+
+def test_batch_scores_match_index(index, scorer, corpus):
+    rows, intents, percentages = scorer.score(corpus)
+    scores = [{} for _ in corpus]
+    for row, intent_id, percentage in zip(rows.tolist(), intents.tolist(), percentages.tolist()):
+        scores[row][intent_id] = percentage
+    assert scores == [index.score(stem_words(message)) for message in corpus]
+
+
+def test_empty_batch(scorer):
+    intents, percentages = scorer.match([])
+    assert intents.tolist() == [] and percentages.tolist() == []
+    assert scorer.respond([]) == []
+
+
+def test_empty_and_unknown_messages(index, scorer):
+    messages = [[], tokenize(''), tokenize('?!'), tokenize('xyzzy plugh')]
+    intents, percentages = scorer.match(messages)
+    assert intents.tolist() == [-1] * len(messages)
+    assert percentages.tolist() == [0] * len(messages)
+
+
+def test_unknown_messages_next_to_known_ones(index, scorer):
+    messages = [tokenize('xyzzy'), tokenize('hello'), [], tokenize('select loans'), tokenize('plugh')]
+    intents, percentages = scorer.match(messages)
+    assert list(zip(intents.tolist(), percentages.tolist())) == [(-1, 0), (0, 20), (-1, 0), (8, 50), (-1, 0)]
@@ -0,0 +1,53 @@
+import json
+import time
+
+import pytest
+
+from catalog import CatalogWatcher, load_intents, open_catalog
+
+HELLO = {'id': 'greeting', 'response': 'Hello!', 'words': ['hello', 'hi'], 'single_response': True, 'required_words': []}
+BYE = {'id': 'goodbye', 'response': 'See you!', 'words': ['bye'], 'single_response': True, 'required_words': []}
+
+
+def write(path, entries):
+    path.write_text(json.dumps(entries), encoding='utf-8')
+
+
+@pytest.mark.parametrize('entries', [
+    {'response': 'Hello!'},
+    ['Hello!'],
+    [dict(HELLO, words=None)],
+    [dict(HELLO, words=[])],
+    [dict(HELLO, words=['hello', 3])],
+    [dict(HELLO, response=None)],
+    [dict(HELLO, required_words='hello')],
+    [dict(HELLO, single_response='yes')],
+    [dict(HELLO, id=None)],
+    [{key: value for key, value in HELLO.items() if key != 'id'}],
+    [HELLO, dict(BYE, id='greeting')],
+])
+def test_load_intents_rejects_malformed_entries(tmp_path, entries):
+    write(tmp_path / 'intents.json', entries)
+    with pytest.raises(ValueError):
+        load_intents(str(tmp_path / 'intents.json'))
+
+
+def test_watcher_survives_a_broken_save(tmp_path):
+    source, artifact = tmp_path / 'intents.json', tmp_path / 'intents.idx'
+    write(source, [HELLO])
+    open_catalog(str(source), str(artifact))
+    indexes = []
+    watcher = CatalogWatcher(indexes.append, str(source), str(artifact), interval=0.01)
+    watcher.start()
+    try:
+        write(source, [dict(HELLO, words=None)])
+        time.sleep(0.1)
+        assert watcher.is_alive() and indexes == []
+        write(source, [HELLO, BYE])
+        deadline = time.monotonic() + 5
+        while not indexes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert watcher.is_alive()
+        assert [len(index) for index in indexes] == [2]
+    finally:
+        watcher.stop()
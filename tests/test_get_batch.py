@@ -0,0 +1,31 @@
+import pytest
+
+import app as finbot
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    database = tmp_path_factory.mktemp('get_batch') / 'database.db'
+    app = finbot.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % database, 'WTF_CSRF_ENABLED': False,
+                             'BCRYPT_LOG_ROUNDS': 4, 'CATALOG_WATCH_INTERVAL': 0, 'BATCH_MAX_MESSAGES': 3})
+    client = app.test_client()
+    client.post('/register', data={'username': 'batcher', 'password': 'password123'})
+    client.post('/login', data={'username': 'batcher', 'password': 'password123'})
+    return client
+
+
+def test_batch_is_answered_in_order(client):
+    response = client.post('/get_batch', json={'messages': ['hello', 'credit card']})
+    assert response.status_code == 200
+    assert response.json['responses'][0] == 'Hello!'
+    assert response.json['responses'][1].startswith('1. Axis Bank Ace Credit Card')
+
+
+@pytest.mark.parametrize('body', [[1, 2], 'abc', 3, None, {}, {'messages': 'hello'}, {'messages': ['hello', 2]}])
+def test_malformed_bodies_are_rejected(client, body):
+    assert client.post('/get_batch', json=body).status_code == 400
+
+
+def test_oversized_batch_is_rejected(client):
+    assert client.post('/get_batch', json={'messages': ['hello'] * 3}).status_code == 200
+    assert client.post('/get_batch', json={'messages': ['hello'] * 4}).status_code == 413
@@ -0,0 +1,46 @@
+import pytest
+
+import app as finbot
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    database = tmp_path_factory.mktemp('history') / 'database.db'
+    app = finbot.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % database, 'WTF_CSRF_ENABLED': False,
+                             'BCRYPT_LOG_ROUNDS': 4, 'CATALOG_WATCH_INTERVAL': 0, 'HISTORY_PAGE_SIZE': 3})
+    client = app.test_client()
+    client.post('/register', data={'username': 'historian', 'password': 'password123'})
+    client.post('/login', data={'username': 'historian', 'password': 'password123'})
+    for msg in ('hello', 'credit card', 'zzz', 'home loan', 'best ways to invest'):
+        client.post('/get', data={'msg': msg})
+    finbot.conversation_log.flush()
+    return client
+
+
+def inputs(response):
+    return [message['user_input'] for message in response.json['messages']]
+
+
+def test_pages_newest_first(client):
+    first = client.get('/history')
+    assert inputs(first) == ['best ways to invest', 'home loan', 'zzz']
+    second = client.get('/history?before=%d' % first.json['next_before'])
+    assert inputs(second) == ['credit card', 'hello']
+    assert second.json['next_before'] is None
+
+
+@pytest.mark.parametrize('limit, expected', [('0', 1), ('-1', 1), ('2', 2), ('1000', 3), ('x', 3)])
+def test_limit_is_clamped_to_the_page_size(client, limit, expected):
+    response = client.get('/history?limit=' + limit)
+    assert response.status_code == 200
+    assert len(response.json['messages']) == expected
+
+
+def test_messages_record_the_intent_id(client):
+    first = client.get('/history').json
+    messages = first['messages'] + client.get('/history?before=%d' % first['next_before']).json['messages']
+    intents = {message['user_input']: message['intent'] for message in messages}
+    assert intents['hello'] == 'greeting'
+    assert intents['credit card'] == 'credit-cards'
+    assert intents['zzz'] is None
+    assert 'finbot_intent_matches_total{intent="credit-cards"}' in client.get('/metrics').get_data(as_text=True)
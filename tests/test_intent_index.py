@@ -0,0 +1,95 @@
+import pytest
+
+from intent_index import stem_words, tokenize
+
+
+def message_probability(user_message, recognised_words, single_response=False, required_words=[]):
+    message_certainty = 0
+    has_required_words = True
+
+    stemmed_message = stem_words(user_message)
+    stemmed_recognised_words = stem_words(recognised_words)
+    stemmed_required_words = stem_words(required_words)
+
+    for word in stemmed_message:
+        if word in recognised_words:
+            message_certainty += 1
+
+    percentage = float(message_certainty) / float(len(recognised_words))
+
+    for word in stemmed_required_words:
+        if word not in stemmed_message:
+            has_required_words = False
+            break
+
+    if has_required_words or single_response:
+        return int(percentage * 100)
+    else:
+        return 0
+
+
+def reference_response(intents, message):
+    """check_all_messages before the index existed; None stands for long.unknown()."""
+    highest_prob_list = {}
+    for bot_response, list_of_words, single_response, required_words, _ in intents:
+        highest_prob_list[bot_response] = message_probability(message, list_of_words, single_response,
+                                                              required_words)
+    best_match = max(highest_prob_list, key=highest_prob_list.get)
+    return None if highest_prob_list[best_match] < 1 else best_match
+
+
+def indexed_response(index, message):
+    intent_id, _ = index.match(message)
+    return None if intent_id is None else index.response(intent_id)
+
+
+def intent_messages(words, required_words):
+    yield ' '.join(words)
+    yield ' '.join(required_words)
+    yield ' '.join(words + required_words)
+    yield ' '.join(word + 's' for word in words)
+    yield ' '.join(words).upper() + '?'
+    yield 'can you tell me about ' + ' '.join(reversed(words))
+
+
+def test_every_intent_matches_reference(intents, index):
+    for bot_response, words, _, required_words, _ in intents:
+        for text in intent_messages(words, required_words):
+            message = tokenize(text)
+            assert indexed_response(index, message) == reference_response(intents, message), text
+
+
+def test_seeded_corpus_matches_reference(intents, index, corpus):
+    mismatches = [message for message in corpus
+                  if indexed_response(index, message) != reference_response(intents, message)]
+    assert mismatches == []
+
+
+def test_scores_match_message_probability(intents, index, corpus):
+    for message in corpus[:500]:
+        expected = {intent_id: message_probability(message, words, single_response, required_words)
+                    for intent_id, (_, words, single_response, required_words, _) in enumerate(intents)}
+        expected = {intent_id: score for intent_id, score in expected.items() if score}
+        assert index.score(stem_words(message)) == expected, message
+
+
+@pytest.mark.parametrize('text, intent_id, percentage', [
+    # 'loans' is stemmed to 'loan' in the message but compared with the
+    # unstemmed recognised words, so the recognised word 'loans' never counts.
+    ('select loans', 8, 50),
+    ('select loan', 8, 50),
+    # 'Personal' and 'Home' are never matched as recognised words (messages
+    # are lowercased and stemmed), but as required words they are stemmed too.
+    ('personal loan', 9, 33),
+    ('Personal Loans please', 9, 33),
+    ('home loans', 10, 33),
+])
+def test_stemmed_message_against_unstemmed_words(index, text, intent_id, percentage):
+    assert index.match(tokenize(text)) == (intent_id, percentage)
+
+
+def test_unmatched_message_falls_back(intents, index):
+    for text in ('', 'home', 'xyzzy plugh', '?!'):
+        message = tokenize(text)
+        assert index.match(message) == (None, 0)
+        assert reference_response(intents, message) is None
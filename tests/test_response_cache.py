@@ -0,0 +1,22 @@
+from intent_index import tokenize
+from response_cache import MISSING, ResponseCache
+
+
+def test_key_ignores_order_and_punctuation():
+    cache = ResponseCache()
+    keys = {cache.key(tokenize(text))[1] for text in ('credit card', 'credit card?', 'Card, credit!', 'credit cards')}
+    assert keys == {('card', 'credit')}
+
+
+def test_key_keeps_repeated_words():
+    cache = ResponseCache()
+    assert cache.key(tokenize('loan loan'))[1] != cache.key(tokenize('loan'))[1]
+
+
+def test_punctuation_variants_share_an_entry(index):
+    cache = ResponseCache()
+    stemmed, key = cache.key(tokenize('credit card?'))
+    assert cache.get(key, index) is MISSING
+    cache.put(key, index.match_stemmed(stemmed), index)
+    assert cache.get(cache.key(tokenize('credit card'))[1], index) == index.match(tokenize('credit card'))
+    assert cache.get(cache.key(tokenize('credit'))[1], index) is MISSING
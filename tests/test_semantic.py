@@ -0,0 +1,136 @@
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from intent_index import IntentIndex
+from semantic import SemanticFallback
+
+
+class StubEncoder:
+    """Bag-of-hashed-words unit vectors; records the size of every encode() call."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def __call__(self, model_dir, threads):
+        return self
+
+    def encode(self, texts):
+        self.calls.append(len(texts))
+        self.entered.set()
+        self.gate.wait()
+        time.sleep(self.delay)
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        vectors[:, 0] = 0.01
+        for row, text in enumerate(texts):
+            for word in text.lower().replace('.', ' ').split():
+                vectors[row, 1 + zlib.crc32(word.encode('utf-8')) % 63] += 1
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out waiting'
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def make_fallback(tmp_path):
+    (tmp_path / 'model').mkdir(exist_ok=True)
+
+    def make_fallback(encoder, index, **options):
+        options = dict({'min_similarity': 0.0, 'timeout': 5}, **options)
+        fallback = SemanticFallback(str(tmp_path / 'model'), str(tmp_path / 'intents.emb.npz'),
+                                    encoder_factory=encoder, **options)
+        fallback.ensure_worker(index)
+        wait_until(lambda: fallback.stats()['ready'] or fallback.failed)
+        return fallback
+    return make_fallback
+
+
+def test_matches_the_nearest_intent(make_fallback, index):
+    fallback = make_fallback(StubEncoder(), index)
+    intent_id, percentage = fallback.match(['credit', 'card', 'offers'], index)
+    assert index.response(intent_id).startswith('1. Axis Bank Ace Credit Card')
+    assert 0 < percentage <= 100
+    assert fallback.stats()['matches'] == 1
+
+
+def test_concurrent_misses_share_one_pass(make_fallback, index):
+    encoder = StubEncoder()
+    fallback = make_fallback(encoder, index, batch_wait=0.2)
+    del encoder.calls[:]
+    barrier = threading.Barrier(20)
+    results = []
+
+    def ask(number):
+        barrier.wait()
+        results.append(fallback.match(['question', str(number)], index))
+
+    threads = [threading.Thread(target=ask, args=(number,)) for number in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert encoder.calls == [20]
+    assert len(results) == 20 and None not in results
+    assert fallback.stats()['batches'] == 1
+
+
+def test_timeout_returns_none(make_fallback, index):
+    encoder = StubEncoder()
+    fallback = make_fallback(encoder, index, timeout=0.05)
+    encoder.delay = 0.5
+    started = time.monotonic()
+    assert fallback.match(['slow'], index) is None
+    assert time.monotonic() - started < 0.4
+    assert fallback.stats()['timeouts'] == 1
+
+
+def test_failed_encoder_factory_disables_the_fallback(make_fallback, index):
+    def broken(model_dir, threads):
+        raise ImportError('No module named torch')
+
+    fallback = make_fallback(broken, index)
+    assert fallback.failed
+    assert fallback.match(['hello'], index) is None
+    assert fallback.stats()['skipped'] == 1
+
+
+def test_stored_embeddings_are_reused(make_fallback, index):
+    make_fallback(StubEncoder(), index)
+    encoder = StubEncoder()
+    fallback = make_fallback(encoder, index)
+    assert encoder.calls == []
+    assert fallback.matrix.shape[0] == len(index)
+
+
+def test_results_for_a_swapped_out_catalog_are_discarded(make_fallback, index, intents):
+    encoder = StubEncoder()
+    fallback = make_fallback(encoder, index)
+    encoder.gate.clear()
+    encoder.entered.clear()
+    first, second = [], []
+    asking_first = threading.Thread(target=lambda: first.append(fallback.match(['credit', 'card'], index)))
+    asking_first.start()
+    # The first message is inside encode(); the second waits in the queue.
+    encoder.entered.wait(5)
+    asking_second = threading.Thread(target=lambda: second.append(fallback.match(['credit', 'card'], index)))
+    asking_second.start()
+    wait_until(lambda: len(fallback.pending) == 1)
+    swapped = IntentIndex.from_intents(intents)
+    fallback.ensure_worker(swapped)
+    encoder.gate.set()
+    asking_first.join()
+    asking_second.join()
+    assert first[0] is not None
+    assert second == [None]
+    assert fallback.index is swapped